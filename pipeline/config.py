@@ -12,12 +12,25 @@ OUTPUT_DIR = PIPELINE_DIR / "opportunities_markdown"
 CSV_OUTPUT = PIPELINE_DIR / "latest_opportunities.csv"
 SOURCE_META_PATH = PIPELINE_DIR / "source_metadata.json"
 OPPORTUNITIES_JSON = PIPELINE_DIR / "opportunities_en.json"
+EMBED_CACHE_PATH = PIPELINE_DIR / "embedding_cache.npz"
+# Max created_at seen in the opportunities table; saves scrape a DB round trip
+LAST_SCRAPED_PATH = PIPELINE_DIR / ".last_scraped"
+# Re-read from the DB once the marker is older than this (0 disables the marker)
+LAST_SCRAPED_MAX_AGE_HOURS = float(os.getenv("LAST_SCRAPED_MAX_AGE_HOURS", "12"))
+# ETag / Last-Modified of the last homepage with nothing new, for conditional fetches
+HOMEPAGE_VALIDATORS_PATH = PIPELINE_DIR / ".homepage_validators.json"
 
 OUTPUT_DIR.mkdir(exist_ok=True)
 
 # ── Scraping ───────────────────────────────────────────────────────────
 BASE_URL = "https://opportunitiescorners.com/"
 EXCLUDE_DOMAINS = ["https://opportunitiescorners"]
+SCRAPE_CONCURRENCY = 16
+SCRAPE_MAX_RETRIES = 4
+SCRAPE_WORKERS = os.cpu_count() or 1
+SCRAPE_USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
 
 # ── Database ───────────────────────────────────────────────────────────
 DB_CONFIG = {
@@ -27,6 +40,8 @@ DB_CONFIG = {
     "user": os.getenv("DB_USER", os.getenv("db_user")),
     "password": os.getenv("DB_PASSWORD", os.getenv("db_password")),
 }
+DB_POOL_MAX_CONN = 8
+DB_FLUSH_SIZE = 50
 
 # ── LLM ────────────────────────────────────────────────────────────────
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -34,15 +49,34 @@ CEREBRAS_API_KEY = os.getenv("CEREBRAS_API_KEY", os.getenv("cerebras_api"))
 LLM_MODEL_GROQ = "openai/gpt-oss-120b"
 LLM_MODEL_CEREBRAS = "gpt-oss-120b"
 SOURCE_LANGUAGE = "en"
+LLM_CONCURRENCY = 8
+TRANSLATE_CONCURRENCY = 4
+LLM_RPM_GROQ = int(os.getenv("LLM_RPM_GROQ", "30"))
+LLM_RPM_CEREBRAS = int(os.getenv("LLM_RPM_CEREBRAS", "30"))
 
 # ── Embeddings (Jina) ─────────────────────────────────────────────────
 JINA_API_KEY = os.getenv("JINA_API_KEY", os.getenv("jina_api_key"))
 JINA_ENDPOINT = "https://api.jina.ai/v1/embeddings"
 JINA_MODEL = "jina-embeddings-v3"
 EMBED_BATCH_SIZE = 100
+EMBED_CONCURRENCY = 4
+EMBED_CHUNK_SIZE = EMBED_BATCH_SIZE * EMBED_CONCURRENCY
+EMBED_MAX_RETRIES = 5
 
 # ── Qdrant ─────────────────────────────────────────────────────────────
 QDRANT_ENDPOINT = os.getenv("QDRANT_ENDPOINT", os.getenv("qdrant_endpoint"))
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", os.getenv("qdrant_api_key"))
 QDRANT_COLLECTION = "opportunities_v1"
-UPSERT_BATCH_SIZE = 10
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "true").lower() in ("1", "true", "yes")
+QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = 60
+UPSERT_BATCH_SIZE = 64
+UPSERT_CONCURRENCY = 4
+UPSERT_MAX_RETRIES = 5
+# Bulk mode pauses HNSW indexing during upload and restores the threshold afterwards (initial loads / reingests)
+BULK_MODE = os.getenv("BULK_MODE", "false").lower() in ("1", "true", "yes")
+QDRANT_INDEXING_THRESHOLD = 20000
+
+# ── Orchestration ──────────────────────────────────────────────────────
+# Max items buffered between streaming steps before the producer waits
+PIPELINE_QUEUE_SIZE = 64
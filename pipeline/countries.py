@@ -10,6 +10,7 @@ Usage:
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 from typing import List, Optional
 
 import pycountry
@@ -120,7 +121,11 @@ def normalize_country(name: str) -> str:
     """
     if not name or not isinstance(name, str):
         return name
+    return _normalize_country_cached(name)
 
+
+@lru_cache(maxsize=4096)
+def _normalize_country_cached(name: str) -> str:
     cleaned = _WHITESPACE.sub(" ", name.strip())
     key = cleaned.lower()
 
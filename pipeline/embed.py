@@ -1,32 +1,60 @@
 """
 Step 3: Embed extracted opportunities and upsert to Qdrant.
 
-Reads opportunities_en.json, generates Jina embeddings,
-and upserts points with structured payloads to Qdrant.
+Streams opportunities_en.json (or, in a streaming pipeline run, items from
+the extract step) in fixed-size chunks, generates Jina embeddings, and
+upserts points with structured payloads to Qdrant.
 """
 
-import json
-import time
+import asyncio
+import base64
+import hashlib
 import logging
-from typing import List
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
 
+import aiohttp
+import grpc
+import ijson
 import numpy as np
-import requests as http_requests
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct
+import orjson
+import pandas as pd
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from qdrant_client.models import Batch, OptimizersConfigDiff
+from tenacity import (
+    before_sleep_log,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential,
+)
 
 from countries import normalize_countries
+from embed_cache import load_cache, save_cache
+from http_retry import RETRY_STATUSES, retry_after_seconds
 
 from config import (
     JINA_API_KEY,
     JINA_ENDPOINT,
     JINA_MODEL,
     EMBED_BATCH_SIZE,
+    EMBED_CHUNK_SIZE,
+    EMBED_CONCURRENCY,
+    EMBED_MAX_RETRIES,
     QDRANT_ENDPOINT,
     QDRANT_API_KEY,
     QDRANT_COLLECTION,
+    QDRANT_PREFER_GRPC,
+    QDRANT_GRPC_PORT,
+    QDRANT_TIMEOUT,
     UPSERT_BATCH_SIZE,
+    UPSERT_CONCURRENCY,
+    UPSERT_MAX_RETRIES,
+    BULK_MODE,
+    QDRANT_INDEXING_THRESHOLD,
     OPPORTUNITIES_JSON,
+    EMBED_CACHE_PATH,
 )
 
 logger = logging.getLogger(__name__)
@@ -35,17 +63,151 @@ logger = logging.getLogger(__name__)
 # ── Embedding helper ───────────────────────────────────────────────────
 
 
-def get_jina_embedding(texts: List[str]) -> np.ndarray:
+def _as_vector(embedding) -> np.ndarray:
+    if isinstance(embedding, str):
+        return np.frombuffer(base64.b64decode(embedding), dtype="<f4")
+    return np.asarray(embedding, dtype=np.float32)
+
+
+def _decode_embeddings(body: bytes) -> np.ndarray:
+    """Decode a Jina response body into an (N, D) float32 array, filled in place."""
+    data = orjson.loads(body)["data"]
+    first = _as_vector(data[0]["embedding"])
+    out = np.empty((len(data), first.shape[0]), dtype=np.float32)
+    out[data[0].get("index", 0)] = first
+    for i, d in enumerate(data[1:], 1):
+        out[d.get("index", i)] = _as_vector(d["embedding"])
+    return out
+
+
+async def get_jina_embedding(session: aiohttp.ClientSession, texts: List[str]) -> np.ndarray:
+    # base64 embeddings are raw little-endian float32 bytes, so they skip JSON float parsing entirely
+    payload = {"model": JINA_MODEL, "input": texts, "embedding_type": "base64"}
+    for attempt in range(1, EMBED_MAX_RETRIES + 1):
+        try:
+            async with session.post(JINA_ENDPOINT, json=payload) as response:
+                if response.status not in RETRY_STATUSES or attempt == EMBED_MAX_RETRIES:
+                    response.raise_for_status()
+                    return _decode_embeddings(await response.read())
+                reason = f"HTTP {response.status}"
+                delay = retry_after_seconds(response.headers.get("Retry-After"), attempt)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == EMBED_MAX_RETRIES:
+                raise
+            reason = type(e).__name__
+            delay = retry_after_seconds(None, attempt)
+        logger.warning("Jina request failed (%s) — retrying in %.1fs (attempt %d/%d)", reason, delay, attempt, EMBED_MAX_RETRIES)
+        await asyncio.sleep(delay)
+
+
+def _cache_key(text: str) -> str:
+    """Cache key for an embedding; includes the model so a model switch invalidates it."""
+    return hashlib.sha256(f"{JINA_MODEL}\n{text.strip()}".encode("utf-8")).hexdigest()
+
+
+def _jina_session() -> aiohttp.ClientSession:
+    """One keep-alive connection pool for the whole run, so TLS handshakes are paid once per connection."""
+    connector = aiohttp.TCPConnector(limit=EMBED_CONCURRENCY, keepalive_timeout=30)
     headers = {
         "Authorization": f"Bearer {JINA_API_KEY}",
         "Content-Type": "application/json",
     }
-    payload = {"model": JINA_MODEL, "input": texts}
-    response = http_requests.post(JINA_ENDPOINT, json=payload, headers=headers, timeout=60)
-    response.raise_for_status()
-    return np.array(
-        [d["embedding"] for d in response.json()["data"]],
-        dtype=np.float32,
+    return aiohttp.ClientSession(connector=connector, headers=headers, timeout=aiohttp.ClientTimeout(total=60))
+
+
+async def _embed_all(session: aiohttp.ClientSession, batches: List[List[str]]) -> List[np.ndarray]:
+    """Embed all batches concurrently (at most EMBED_CONCURRENCY in flight), preserving order."""
+    sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+    total = sum(len(b) for b in batches)
+
+    async def _bounded(start: int, batch: List[str]) -> np.ndarray:
+        async with sem:
+            logger.info("Embedding batch %d–%d / %d", start, start + len(batch), total)
+            return await get_jina_embedding(session, batch)
+
+    return await asyncio.gather(
+        *(_bounded(i * EMBED_BATCH_SIZE, batch) for i, batch in enumerate(batches))
+    )
+
+
+async def _embed_texts(
+    session: aiohttp.ClientSession, rich_texts: List[str], cache: Dict[str, np.ndarray]
+) -> np.ndarray:
+    """Embed texts as an (N, D) array, sending only unique cache misses to Jina."""
+    keys = np.asarray([_cache_key(t) for t in rich_texts])
+    unique_keys, first_indices, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    miss = [(key, rich_texts[i]) for key, i in zip(unique_keys, first_indices) if key not in cache]
+    logger.info(
+        "Embedding texts: unique=%d / total=%d (cache hits=%d, misses=%d)",
+        len(unique_keys), len(keys), len(unique_keys) - len(miss), len(miss),
+    )
+
+    if miss:
+        miss_texts = [text for _, text in miss]
+        batches = [miss_texts[i : i + EMBED_BATCH_SIZE] for i in range(0, len(miss_texts), EMBED_BATCH_SIZE)]
+        results = await _embed_all(session, batches)
+        miss_embeddings = np.empty((len(miss_texts), results[0].shape[1]), dtype=np.float32)
+        for start, embeddings in zip(range(0, len(miss_texts), EMBED_BATCH_SIZE), results):
+            miss_embeddings[start : start + len(embeddings)] = embeddings
+        for (key, _), vec in zip(miss, miss_embeddings):
+            cache[key] = vec
+
+    unique_embeddings = np.stack([cache[key] for key in unique_keys])
+    return unique_embeddings[inverse.ravel()]
+
+
+# ── Qdrant upsert ──────────────────────────────────────────────────────
+
+
+def _is_transient_qdrant_error(exc: BaseException) -> bool:
+    """Retry on server errors and timeouts; client errors (4xx) are not worth retrying."""
+    if isinstance(exc, UnexpectedResponse):
+        return exc.status_code is not None and exc.status_code >= 500
+    if isinstance(exc, grpc.RpcError):
+        return exc.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.INTERNAL)
+    return isinstance(exc, (ResponseHandlingException, asyncio.TimeoutError))
+
+
+@retry(
+    retry=retry_if_exception(_is_transient_qdrant_error),
+    wait=wait_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(UPSERT_MAX_RETRIES),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True,
+)
+async def _upsert_batch(client: AsyncQdrantClient, batch: Batch) -> None:
+    await client.upsert(collection_name=QDRANT_COLLECTION, points=batch, wait=False)
+
+
+def _qdrant_client() -> AsyncQdrantClient:
+    return AsyncQdrantClient(
+        url=QDRANT_ENDPOINT,
+        api_key=QDRANT_API_KEY,
+        prefer_grpc=QDRANT_PREFER_GRPC,
+        grpc_port=QDRANT_GRPC_PORT,
+        timeout=QDRANT_TIMEOUT,
+    )
+
+
+async def _upsert_all(
+    client: AsyncQdrantClient, ids: List[str], vectors: np.ndarray, payloads: List[dict]
+) -> None:
+    """Upsert columnar batches of UPSERT_BATCH_SIZE points, at most UPSERT_CONCURRENCY in flight."""
+    sem = asyncio.Semaphore(UPSERT_CONCURRENCY)
+
+    async def _bounded(start: int) -> None:
+        end = start + UPSERT_BATCH_SIZE
+        batch = Batch(ids=ids[start:end], vectors=vectors[start:end].tolist(), payloads=payloads[start:end])
+        async with sem:
+            await _upsert_batch(client, batch)
+
+    await asyncio.gather(*(_bounded(i) for i in range(0, len(ids), UPSERT_BATCH_SIZE)))
+
+
+async def _set_indexing_threshold(client: AsyncQdrantClient, threshold: int) -> None:
+    await client.update_collection(
+        collection_name=QDRANT_COLLECTION,
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold),
     )
 
 
@@ -55,6 +217,8 @@ def get_jina_embedding(texts: List[str]) -> np.ndarray:
 def ensure_list(val):
     if val is None:
         return []
+    if isinstance(val, list):
+        return val
     return [val] if isinstance(val, str) else list(val)
 
 
@@ -71,29 +235,16 @@ def build_exam_scores(lang_reqs):
     return scores
 
 
-# ── Main ───────────────────────────────────────────────────────────────
-
-
-def run() -> bool:
-    """
-    Execute the embedding step.
-    Returns True on success.
-    """
-    if not OPPORTUNITIES_JSON.exists():
-        logger.error("opportunities_en.json not found at %s — run extract step first", OPPORTUNITIES_JSON)
-        return False
-
-    opportunities = json.loads(OPPORTUNITIES_JSON.read_text(encoding="utf-8"))
-    logger.info("Loaded %d opportunities from %s", len(opportunities), OPPORTUNITIES_JSON)
-
-    if not opportunities:
-        logger.warning("No opportunities to embed")
-        return False
+# Opportunity fields read when building Qdrant payloads
+_PAYLOAD_SOURCE_FIELDS = [
+    "id", "title", "country", "fund_type", "type", "documents_required", "language_requirements",
+    "is_remote", "eligible_nationalities", "target_segment", "deadline",
+    "min_age", "max_age", "gpa", "application_fee",
+]
 
-    # ── Prepare texts + metadata ───────────────────────────────────────
-    rich_texts = []
-    opportunity_data = []
 
+def gen_rich_texts_and_data(opportunities: Iterable[dict]) -> Iterator[Tuple[str, dict]]:
+    """Normalize each opportunity's countries and yield (text to embed, opportunity)."""
     for s in opportunities:
         # Normalize country names
         if s.get("country"):
@@ -109,67 +260,143 @@ def run() -> bool:
             f"{s.get('description', '')}\n"
             f"Eligibility: {s.get('eligibility', '')}\n"
         )
-        rich_texts.append(rich_text)
-        opportunity_data.append(s)
-
-    # ── Batch embed ────────────────────────────────────────────────────
-    all_embeddings = []
-    for i in range(0, len(rich_texts), EMBED_BATCH_SIZE):
-        batch = rich_texts[i : i + EMBED_BATCH_SIZE]
-        logger.info("Embedding batch %d–%d / %d", i, i + len(batch), len(rich_texts))
-        embeddings = get_jina_embedding(batch)
-        all_embeddings.extend(embeddings)
-        time.sleep(1)
-
-    logger.info("Generated %d embeddings", len(all_embeddings))
-
-    # ── Build Qdrant points ────────────────────────────────────────────
-    points = []
-
-    for s, embedding in zip(opportunity_data, all_embeddings):
-        countries = ensure_list(s.get("country"))
-        fund_types = ensure_list(s.get("fund_type"))
-        subtypes = ensure_list(s.get("type", {}).get("subtype"))
-        target_segments = ensure_list(s.get("target_segment"))
-        documents_required = ensure_list(s.get("documents_required"))
-        eligible_nationalities = ensure_list(s.get("eligible_nationalities", "all"))
-        application_fee = s.get("application_fee")
-
-        exam_scores = build_exam_scores(s.get("language_requirements"))
-
-        payload = {
-            "program_id": s["id"],
-            "title": s.get("title"),
-            "country": countries,
-            "fund_type": fund_types,
-            "category": s.get("type", {}).get("category"),
-            "subtype": subtypes,
-            "documents_required": documents_required,
-            "exam_scores": exam_scores,
-            "is_remote": s.get("is_remote", False),
-            "eligible_nationalities": eligible_nationalities,
-            "target_segment": target_segments,
-            "deadline": s.get("deadline"),
-            "min_age": int(s["min_age"]) if s.get("min_age") is not None else None,
-            "max_age": int(s["max_age"]) if s.get("max_age") is not None else None,
-            "gpa": float(s["gpa"]) if s.get("gpa") is not None else None,
-            "has_language_requirements": len(exam_scores) > 0,
-            "has_fee": bool(application_fee),
-            "has_document_requirements": bool(documents_required),
-        }
-
-        points.append(PointStruct(id=s["id"], vector=embedding, payload=payload))
-
-    # ── Upsert to Qdrant ──────────────────────────────────────────────
-    client = QdrantClient(url=QDRANT_ENDPOINT, api_key=QDRANT_API_KEY)
-    for i in range(0, len(points), UPSERT_BATCH_SIZE):
-        batch = points[i : i + UPSERT_BATCH_SIZE]
-        client.upsert(collection_name=QDRANT_COLLECTION, points=batch)
-
-    logger.info("Upserted %d points to Qdrant collection '%s'", len(points), QDRANT_COLLECTION)
+        yield rich_text, s
+
+
+def build_payloads(opportunity_data: List[dict]) -> Tuple[List[str], List[dict]]:
+    """Build Qdrant point ids and payloads, computing payload columns over the whole chunk at once."""
+    df = pd.DataFrame.from_records(opportunity_data).reindex(columns=_PAYLOAD_SOURCE_FIELDS)
+    df = df.astype(object).where(df.notna(), None)
+    type_info = df["type"].map(lambda t: t if isinstance(t, dict) else {})
+    documents_required = df["documents_required"].map(ensure_list)
+    exam_scores = df["language_requirements"].map(build_exam_scores)
+
+    payloads = pd.DataFrame({
+        "program_id": df["id"],
+        "title": df["title"],
+        "country": df["country"].map(ensure_list),
+        "fund_type": df["fund_type"].map(ensure_list),
+        "category": type_info.map(lambda t: t.get("category")),
+        "subtype": type_info.map(lambda t: ensure_list(t.get("subtype"))),
+        "documents_required": documents_required,
+        "exam_scores": exam_scores,
+        "is_remote": df["is_remote"].map(bool),
+        "eligible_nationalities": df["eligible_nationalities"].fillna("all").map(ensure_list),
+        "target_segment": df["target_segment"].map(ensure_list),
+        "deadline": df["deadline"],
+        "min_age": np.trunc(pd.to_numeric(df["min_age"], errors="coerce")).astype("Int64"),
+        "max_age": np.trunc(pd.to_numeric(df["max_age"], errors="coerce")).astype("Int64"),
+        "gpa": pd.to_numeric(df["gpa"], errors="coerce"),
+        "has_language_requirements": exam_scores.map(bool),
+        "has_fee": df["application_fee"].map(bool),
+        "has_document_requirements": documents_required.map(bool),
+    })
+    # Payloads must carry None (not NaN/NA) for missing values
+    payloads = payloads.astype(object).where(payloads.notna(), None)
+
+    return payloads["program_id"].tolist(), payloads.to_dict("records")
+
+
+# ── Main ───────────────────────────────────────────────────────────────
+
+
+async def _file_chunks() -> AsyncIterator[List[dict]]:
+    """Stream opportunities_en.json in EMBED_CHUNK_SIZE chunks."""
+    with OPPORTUNITIES_JSON.open("rb") as f:
+        items = ijson.items(f, "item", use_float=True)
+        while chunk := list(islice(items, EMBED_CHUNK_SIZE)):
+            yield chunk
+
+
+async def _queue_chunks(queue: asyncio.Queue) -> AsyncIterator[List[dict]]:
+    """
+    Group items from an upstream queue into chunks: wait for one item, then take
+    whatever else is already queued, up to EMBED_CHUNK_SIZE, until the None sentinel.
+    """
+    done = False
+    while not done:
+        item = await queue.get()
+        if item is None:
+            return
+        chunk = [item]
+        while len(chunk) < EMBED_CHUNK_SIZE and not queue.empty():
+            item = queue.get_nowait()
+            if item is None:
+                done = True
+                break
+            chunk.append(item)
+        yield chunk
+
+
+async def _embed_stream(chunks: AsyncIterator[List[dict]]) -> bool:
+    """Embed and upsert each chunk of opportunities as it arrives."""
+    # Don't open sessions or touch the collection if there is nothing to embed
+    first = await anext(chunks, None)
+    if first is None:
+        logger.warning("No opportunities to embed")
+        return False
+
+    cache = load_cache(EMBED_CACHE_PATH)
+    cached_before = len(cache)
+    total = 0
+
+    try:
+        async with _jina_session() as session:
+            client = _qdrant_client()
+            if BULK_MODE:
+                logger.info("Bulk mode: pausing indexing on '%s' during upload", QDRANT_COLLECTION)
+                await _set_indexing_threshold(client, 0)
+            try:
+                chunk = first
+                while chunk is not None:
+                    pairs = list(gen_rich_texts_and_data(chunk))
+                    rich_texts = [text for text, _ in pairs]
+                    opportunity_data = [s for _, s in pairs]
+                    logger.info("Processing opportunities %d–%d", total, total + len(pairs))
+
+                    embeddings = await _embed_texts(session, rich_texts, cache)
+                    ids, payloads = build_payloads(opportunity_data)
+                    await _upsert_all(client, ids, embeddings, payloads)
+                    total += len(ids)
+                    chunk = await anext(chunks, None)
+            finally:
+                if BULK_MODE:
+                    logger.info("Bulk mode: restoring indexing_threshold=%d", QDRANT_INDEXING_THRESHOLD)
+                    await _set_indexing_threshold(client, QDRANT_INDEXING_THRESHOLD)
+                await client.close()
+    finally:
+        if len(cache) > cached_before:
+            save_cache(EMBED_CACHE_PATH, cache)
+
+    logger.info("Upserted %d points to Qdrant collection '%s'", total, QDRANT_COLLECTION)
     return True
 
 
+def run() -> bool:
+    """
+    Execute the embedding step.
+    Returns True on success.
+    """
+    if not OPPORTUNITIES_JSON.exists():
+        logger.error("opportunities_en.json not found at %s — run extract step first", OPPORTUNITIES_JSON)
+        return False
+
+    # Stream the file so memory stays bounded by EMBED_CHUNK_SIZE rather than the file size
+    return asyncio.run(_embed_stream(_file_chunks()))
+
+
+async def stream(in_queue: asyncio.Queue, out_queue: Optional[asyncio.Queue] = None) -> bool:
+    """
+    Pipeline stage: embed opportunities from in_queue as they are saved upstream.
+    out_queue is unused (last step) but still gets a None sentinel.
+    """
+    try:
+        return await _embed_stream(_queue_chunks(in_queue))
+    finally:
+        if out_queue is not None:
+            await out_queue.put(None)
+
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
     run()
@@ -0,0 +1,36 @@
+"""
+On-disk embedding cache, keyed by a SHA-256 digest of the embedded text.
+
+Stored as a single compressed .npz archive (one float32 array per key) so
+re-runs only send changed texts to Jina.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def load_cache(path: Path) -> Dict[str, np.ndarray]:
+    """Load the cache from disk. Returns an empty dict if missing or unreadable."""
+    if not path.exists():
+        return {}
+    try:
+        with np.load(path) as archive:
+            cache = {key: archive[key] for key in archive.files}
+        logger.info("Loaded %d cached embeddings from %s", len(cache), path)
+        return cache
+    except Exception as e:
+        logger.warning("Could not read embedding cache %s: %s — starting empty", path, e)
+        return {}
+
+
+def save_cache(path: Path, cache: Dict[str, np.ndarray]) -> None:
+    """Write the cache atomically (temp file + rename) so a crash never leaves it truncated."""
+    tmp_path = path.with_suffix(".tmp.npz")
+    np.savez_compressed(tmp_path, **cache)
+    tmp_path.replace(path)
+    logger.info("Saved %d cached embeddings to %s", len(cache), path)
@@ -5,29 +5,39 @@ Reads each Markdown file, sends it to an LLM for information extraction,
 translates to both English and Arabic, and saves to PostgreSQL + JSON.
 """
 
-import json
+import asyncio
 import re
-import random
-import time
 import uuid
 import logging
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+import orjson
 import psycopg2
-from psycopg2.extras import Json
-from openai import OpenAI
+from psycopg2.extras import Json, execute_values
+from psycopg2.pool import ThreadedConnectionPool
+from aiolimiter import AsyncLimiter
+from openai import AsyncOpenAI
 
 from countries import normalize_country, normalize_countries
+from last_scraped import save_marker
+from streaming import iter_items, iter_queue
 
 from config import (
     DB_CONFIG,
+    DB_POOL_MAX_CONN,
+    DB_FLUSH_SIZE,
     GROQ_API_KEY,
     CEREBRAS_API_KEY,
     LLM_MODEL_GROQ,
     LLM_MODEL_CEREBRAS,
     SOURCE_LANGUAGE,
+    LLM_CONCURRENCY,
+    TRANSLATE_CONCURRENCY,
+    LLM_RPM_GROQ,
+    LLM_RPM_CEREBRAS,
     OUTPUT_DIR,
     SOURCE_META_PATH,
     OPPORTUNITIES_JSON,
@@ -35,6 +45,9 @@ from config import (
 
 logger = logging.getLogger(__name__)
 
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.S)
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
 
 # ── LLM round-robin ───────────────────────────────────────────────────
 
@@ -48,18 +61,20 @@ def _init_clients():
         return
     if GROQ_API_KEY:
         _CLIENTS.append({
-            "client": OpenAI(api_key=GROQ_API_KEY, base_url="https://api.groq.com/openai/v1"),
+            "client": AsyncOpenAI(api_key=GROQ_API_KEY, base_url="https://api.groq.com/openai/v1"),
             "model": LLM_MODEL_GROQ,
             "name": "groq",
+            "limiter": AsyncLimiter(LLM_RPM_GROQ, 60),
         })
         logger.info("Groq client initialized")
     else:
         logger.warning("GROQ_API_KEY not set — skipping Groq client")
     if CEREBRAS_API_KEY:
         _CLIENTS.append({
-            "client": OpenAI(api_key=CEREBRAS_API_KEY, base_url="https://api.groq.com/openai/v1"),
+            "client": AsyncOpenAI(api_key=CEREBRAS_API_KEY, base_url="https://api.groq.com/openai/v1"),
             "model": LLM_MODEL_GROQ,
             "name": "cerebras",
+            "limiter": AsyncLimiter(LLM_RPM_CEREBRAS, 60),
         })
         logger.info("Cerebras client initialized")
     else:
@@ -76,17 +91,18 @@ def _get_next_client() -> Dict:
     return entry
 
 
-def llm_call(messages, temperature=0.3, max_tokens=5000) -> str:
+async def llm_call(messages, temperature=0.3, max_tokens=5000) -> str:
     _init_clients()
     primary = _get_next_client()
     try:
         logger.info("LLM call using %s (%s)", primary["name"], primary["model"])
-        resp = primary["client"].chat.completions.create(
-            model=primary["model"],
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-        )
+        async with primary["limiter"]:
+            resp = await primary["client"].chat.completions.create(
+                model=primary["model"],
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
         logger.info("%s succeeded", primary["name"])
         return resp.choices[0].message.content.strip()
     except Exception as e:
@@ -94,12 +110,13 @@ def llm_call(messages, temperature=0.3, max_tokens=5000) -> str:
         fallback = _get_next_client()
         logger.info("Retrying with %s (%s)...", fallback["name"], fallback["model"])
         try:
-            resp = fallback["client"].chat.completions.create(
-                model=fallback["model"],
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
+            async with fallback["limiter"]:
+                resp = await fallback["client"].chat.completions.create(
+                    model=fallback["model"],
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
             logger.info("%s succeeded (fallback)", fallback["name"])
             return resp.choices[0].message.content.strip()
         except Exception as e2:
@@ -214,7 +231,7 @@ Allowed top-level fields (only include those that actually appear in the text):
 # ── Extraction & translation ──────────────────────────────────────────
 
 
-def extract_opportunity_info(markdown_content: str, filename: str) -> Optional[Dict[str, Any]]:
+async def _call_llm(markdown_content: str) -> str:
     user_prompt = f"""Extract structured information from the following markdown document about an opportunity:
 
     ---MARKDOWN START---
@@ -229,51 +246,58 @@ def extract_opportunity_info(markdown_content: str, filename: str) -> Optional[D
     - Preserve the original language of the document exactly
     - Follow the SYSTEM_PROMPT schema strictly
     """
-    try:
-        response_text = llm_call(
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-            temperature=0.3,
-            max_tokens=5000,
-        )
+    return await llm_call(
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        temperature=0.3,
+        max_tokens=5000,
+    )
 
-        if "```" in response_text:
-            matches = re.findall(r"```json(.*?)```|```(.*?)```", response_text, re.S)
-            if matches:
-                response_text = next(x for pair in matches for x in pair if x).strip()
 
-        if not response_text.startswith("{") and not response_text.startswith("["):
-            json_start = response_text.find("{")
-            if json_start != -1:
-                response_text = response_text[json_start:]
+def _parse_llm_response(response_text: str, filename: str):
+    """Parse an extraction response into one or more opportunity dicts."""
+    fence = _FENCE_RE.search(response_text)
+    if fence:
+        response_text = fence.group(1).strip()
 
-        parsed_data = json.loads(response_text)
+    if not response_text.startswith("{") and not response_text.startswith("["):
+        json_start = response_text.find("{")
+        if json_start != -1:
+            response_text = response_text[json_start:]
 
-        if isinstance(parsed_data, list):
-            for item in parsed_data:
-                item["id"] = str(uuid.uuid4())
-                item["_source_file"] = filename
-        else:
-            parsed_data["id"] = str(uuid.uuid4())
-            parsed_data["_source_file"] = filename
+    parsed_data = orjson.loads(response_text)
+
+    if isinstance(parsed_data, list):
+        for item in parsed_data:
+            item["id"] = str(uuid.uuid4())
+            item["_source_file"] = filename
+    else:
+        parsed_data["id"] = str(uuid.uuid4())
+        parsed_data["_source_file"] = filename
 
-        return parsed_data
+    return parsed_data
+
+
+async def extract_opportunity_info(markdown_content: str, filename: str) -> Optional[Dict[str, Any]]:
+    try:
+        response_text = await _call_llm(markdown_content)
+        return _parse_llm_response(response_text, filename)
 
     except Exception as e:
         logger.error("Extraction failed for %s: %s", filename, str(e)[:80])
         return None
 
 
-def translate_to_language(data: Dict[str, Any], target_language: str) -> Dict[str, Any]:
+async def translate_to_language(data: Dict[str, Any], target_language: str) -> Dict[str, Any]:
     preserved_fields = {}
     for field in ("id", "_source_file"):
         if field in data:
             preserved_fields[field] = data[field]
 
     data_to_translate = {k: v for k, v in data.items() if k not in preserved_fields}
-    data_json_str = json.dumps(data_to_translate, ensure_ascii=False, indent=2)
+    data_json_str = orjson.dumps(data_to_translate, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
 
     if target_language == "en":
         instruction = (
@@ -297,7 +321,7 @@ def translate_to_language(data: Dict[str, Any], target_language: str) -> Dict[st
         )
 
     try:
-        response_text = llm_call(
+        response_text = await llm_call(
             messages=[
                 {"role": "system", "content": "You are a professional translator. Respond with valid JSON only."},
                 {"role": "user", "content": f"{instruction}\n\n{data_json_str}"},
@@ -306,17 +330,16 @@ def translate_to_language(data: Dict[str, Any], target_language: str) -> Dict[st
             max_tokens=5000,
         )
 
-        if "```" in response_text:
-            matches = re.findall(r"```json(.*?)```|```(.*?)```", response_text, re.S)
-            if matches:
-                response_text = next(x for pair in matches for x in pair if x).strip()
+        fence = _FENCE_RE.search(response_text)
+        if fence:
+            response_text = fence.group(1).strip()
 
         if not response_text.startswith("{"):
             json_start = response_text.find("{")
             if json_start != -1:
                 response_text = response_text[json_start:]
 
-        translated = json.loads(response_text)
+        translated = orjson.loads(response_text)
         for field, value in preserved_fields.items():
             translated[field] = value
         return translated
@@ -332,13 +355,15 @@ def translate_to_language(data: Dict[str, Any], target_language: str) -> Dict[st
 def ensure_list(val):
     if val is None:
         return None
+    if isinstance(val, list):
+        return val
     return [val] if isinstance(val, str) else list(val)
 
 
 def parse_date(val):
     if not val or not isinstance(val, str):
         return None
-    if re.match(r"^\d{4}-\d{2}-\d{2}$", val):
+    if _DATE_RE.match(val):
         return val
     return None
 
@@ -355,21 +380,68 @@ def normalize_opp_countries(data: dict):
             data["eligible_nationalities"] = [normalize_country(raw)]
 
 
-def save_to_db(
+_DB_POOL: Optional[ThreadedConnectionPool] = None
+_DB_POOL_LOCK = threading.Lock()
+
+_UPSERT_SQL = """
+    INSERT INTO opportunities (
+        id, source, source_url, source_md,
+        data_en, data_ar,
+        category, subtype, country, fund_type, target_segment,
+        deadline, is_remote,
+        created_at, updated_at
+    )
+    VALUES %s
+    ON CONFLICT (id) DO UPDATE SET
+        source = EXCLUDED.source,
+        source_url = EXCLUDED.source_url,
+        source_md = EXCLUDED.source_md,
+        data_en = EXCLUDED.data_en,
+        data_ar = EXCLUDED.data_ar,
+        category = EXCLUDED.category,
+        subtype = EXCLUDED.subtype,
+        country = EXCLUDED.country,
+        fund_type = EXCLUDED.fund_type,
+        target_segment = EXCLUDED.target_segment,
+        deadline = EXCLUDED.deadline,
+        is_remote = EXCLUDED.is_remote,
+        updated_at = EXCLUDED.updated_at
+    RETURNING created_at;
+"""
+
+_UPSERT_TEMPLATE = "(%s::uuid, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+
+def _get_db_pool() -> ThreadedConnectionPool:
+    global _DB_POOL
+    # Called from to_thread workers, so creation must not race
+    with _DB_POOL_LOCK:
+        if _DB_POOL is None:
+            _DB_POOL = ThreadedConnectionPool(1, DB_POOL_MAX_CONN, **DB_CONFIG)
+        return _DB_POOL
+
+
+def close_db_pool():
+    global _DB_POOL
+    with _DB_POOL_LOCK:
+        if _DB_POOL is not None:
+            _DB_POOL.closeall()
+            _DB_POOL = None
+
+
+def build_db_row(
     opportunity_id: str,
     data_en: dict,
     data_ar: dict,
     source: str = "opportunitiescorners",
     source_url: str = None,
     source_md: str = None,
-):
+) -> tuple:
+    """Build one opportunities row (matching _UPSERT_TEMPLATE) from EN + AR data."""
     normalize_opp_countries(data_en)
 
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
     now = datetime.now(timezone.utc)
-
-    type_info = data_en.get("type", {}) or {}
+    type_info = data_en.get("type") or {}
     category = type_info.get("category")
     subtype = ensure_list(type_info.get("subtype"))
     country = ensure_list(data_en.get("country"))
@@ -378,163 +450,249 @@ def save_to_db(
     deadline = parse_date(data_en.get("deadline"))
     is_remote = bool(data_en.get("is_remote", False))
 
-    cur.execute(
-        """
-        INSERT INTO opportunities (
-            id, source, source_url, source_md,
-            data_en, data_ar,
-            category, subtype, country, fund_type, target_segment,
-            deadline, is_remote,
-            created_at, updated_at
-        )
-        VALUES (
-            %s::uuid, %s, %s, %s,
-            %s, %s,
-            %s, %s, %s, %s, %s,
-            %s, %s,
-            %s, %s
-        )
-        ON CONFLICT (id) DO UPDATE SET
-            source = EXCLUDED.source,
-            source_url = EXCLUDED.source_url,
-            source_md = EXCLUDED.source_md,
-            data_en = EXCLUDED.data_en,
-            data_ar = EXCLUDED.data_ar,
-            category = EXCLUDED.category,
-            subtype = EXCLUDED.subtype,
-            country = EXCLUDED.country,
-            fund_type = EXCLUDED.fund_type,
-            target_segment = EXCLUDED.target_segment,
-            deadline = EXCLUDED.deadline,
-            is_remote = EXCLUDED.is_remote,
-            updated_at = EXCLUDED.updated_at;
-        """,
-        (
-            opportunity_id, source, source_url, source_md,
-            Json(data_en), Json(data_ar),
-            category, subtype, country, fund_type, target_segment,
-            deadline, is_remote,
-            now, now,
-        ),
+    return (
+        opportunity_id, source, source_url, source_md,
+        Json(data_en), Json(data_ar),
+        category, subtype, country, fund_type, target_segment,
+        deadline, is_remote,
+        now, now,
     )
 
+
+def _upsert_rows(conn, rows: List[tuple]) -> List[datetime]:
+    """Upsert rows in one statement and commit; returns their created_at values."""
+    with conn.cursor() as cur:
+        created = execute_values(cur, _UPSERT_SQL, rows, template=_UPSERT_TEMPLATE, fetch=True)
     conn.commit()
-    cur.close()
-    conn.close()
+    return [row[0] for row in created]
+
+
+def save_batch_to_db(rows: List[tuple]) -> Tuple[List[bool], Optional[datetime]]:
+    """
+    Upsert many rows in a single round trip on a pooled connection. If the batch is
+    rejected, retry row by row so only the offending rows are dropped.
+    Returns which rows were saved and the latest created_at among them.
+    """
+    if not rows:
+        return [], None
+    pool = _get_db_pool()
+    conn = pool.getconn()
+    try:
+        try:
+            return [True] * len(rows), max(_upsert_rows(conn, rows))
+        except psycopg2.Error as e:
+            conn.rollback()
+            if conn.closed:
+                raise
+            logger.warning("  DB batch of %d failed (%s) — retrying row by row", len(rows), str(e)[:80])
+
+        saved, latest = [], None
+        for row in rows:
+            try:
+                created_at = _upsert_rows(conn, [row])[0]
+            except psycopg2.Error as e:
+                conn.rollback()
+                if conn.closed:
+                    raise
+                logger.error("  DB row %s failed: %s", row[0], str(e)[:80])
+                saved.append(False)
+                continue
+            saved.append(True)
+            latest = created_at if latest is None else max(latest, created_at)
+        return saved, latest
+    finally:
+        pool.putconn(conn)
 
 
 # ── Main ───────────────────────────────────────────────────────────────
 
 
-def run() -> bool:
-    """
-    Execute the extraction step.
-    Returns True if new opportunities were extracted and saved.
-    """
-    # Load source metadata
-    source_metadata = {}
-    if SOURCE_META_PATH.exists():
-        with open(SOURCE_META_PATH, "r", encoding="utf-8") as f:
-            source_metadata = json.load(f)
-        logger.info("Loaded source metadata for %d files", len(source_metadata))
+async def _extract_file(file_path: Path, sem: asyncio.Semaphore):
+    """Read one markdown file and extract it, holding a concurrency slot for the LLM call."""
+    async with sem:
+        markdown_content = file_path.read_text(encoding="utf-8")
+        return markdown_content, await extract_opportunity_info(markdown_content, file_path.name)
 
-    markdown_files = sorted(OUTPUT_DIR.glob("*.md"))
-    logger.info("Found %d markdown files to process", len(markdown_files))
 
-    if not markdown_files:
-        logger.warning("No markdown files found in %s — run scrape step first", OUTPUT_DIR)
-        return False
+async def _translate_item(item: Dict[str, Any], sem: asyncio.Semaphore):
+    """Translate one extracted item into the other language, holding a concurrency slot."""
+    opp_id = item["id"]
+    source = item.pop("_source", "opportunitiescorners")
+    source_url = item.pop("_source_url", None)
+    source_md = item.pop("_source_md", None)
 
-    all_extracted_data = []
-    successful = 0
-    failed = 0
-    skipped_no_link = 0
+    async with sem:
+        if SOURCE_LANGUAGE == "en":
+            data_en = item
+            data_ar = await translate_to_language(item, "ar")
+        else:
+            data_ar = item
+            data_en = await translate_to_language(item, "en")
 
-    for idx, file_path in enumerate(markdown_files, 1):
-        logger.info("[%d/%d] Processing: %s", idx, len(markdown_files), file_path.name[:50])
+    for d in (data_en, data_ar):
+        d.pop("_source_file", None)
+    return opp_id, data_en, data_ar, source, source_url, source_md
+
+
+def _load_source_metadata() -> Dict[str, Dict[str, str]]:
+    if not SOURCE_META_PATH.exists():
+        return {}
+    source_metadata = orjson.loads(SOURCE_META_PATH.read_bytes())
+    logger.info("Loaded source metadata for %d files", len(source_metadata))
+    return source_metadata
 
-        try:
-            markdown_content = file_path.read_text(encoding="utf-8")
-            extracted_data = extract_opportunity_info(markdown_content, file_path.name)
-
-            if extracted_data:
-                meta = source_metadata.get(file_path.name, {})
-                items = extracted_data if isinstance(extracted_data, list) else [extracted_data]
-
-                valid_items = []
-                for item in items:
-                    if not item.get("application_link"):
-                        skipped_no_link += 1
-                        continue
-                    item["_source"] = meta.get("source", "opportunitiescorners")
-                    item["_source_url"] = meta.get("source_url", "")
-                    item["_source_md"] = markdown_content
-                    valid_items.append(item)
-
-                if valid_items:
-                    all_extracted_data.extend(valid_items)
-                    logger.info("  Extracted %d with application link", len(valid_items))
-                else:
-                    logger.info("  Skipped (no application_link)")
-                successful += 1
-            else:
-                logger.warning("  No data extracted")
-                failed += 1
-
-            time.sleep(random.uniform(10, 20))
 
+async def _extract_stream(file_paths: AsyncIterator[Path], out_queue: Optional[asyncio.Queue] = None) -> bool:
+    """
+    Extract, translate and save each markdown file as soon as it arrives.
+    Saved English items are also put on out_queue for the embed step.
+    """
+    # Loaded on the first file: scrape writes it before any markdown
+    source_metadata: Optional[Dict[str, Dict[str, str]]] = None
+    stats = {"files": 0, "ok": 0, "failed": 0, "no_link": 0, "valid": 0}
+    all_en_data: List[Dict[str, Any]] = []
+    pending_rows: List[tuple] = []
+    pending_en: List[Dict[str, Any]] = []
+    saved = 0
+
+    llm_sem = asyncio.Semaphore(LLM_CONCURRENCY)
+    translate_sem = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+    flush_lock = asyncio.Lock()
+
+    async def _flush():
+        nonlocal saved
+        rows, items = list(pending_rows), list(pending_en)
+        pending_rows.clear()
+        pending_en.clear()
+        if not rows:
+            return
+        # One flush at a time: the pool raises instead of blocking when it runs out of connections
+        async with flush_lock:
+            try:
+                saved_mask, latest = await asyncio.to_thread(save_batch_to_db, rows)
+            except Exception as e:
+                logger.error("  DB batch of %d failed: %s", len(rows), str(e)[:80])
+                return
+        items = [item for item, ok in zip(items, saved_mask) if ok]
+        if latest is not None:
+            save_marker(latest, advance_only=True)
+        saved += len(items)
+        all_en_data.extend(items)
+        logger.info("  Saved %d to DB", len(items))
+        if out_queue is not None:
+            for data_en in items:
+                await out_queue.put(data_en)
+
+    async def _process_file(file_path: Path):
+        try:
+            markdown_content, extracted_data = await _extract_file(file_path, llm_sem)
         except Exception as e:
-            logger.error("  Error: %s", str(e)[:80])
-            failed += 1
+            logger.error("Error processing %s: %s", file_path.name[:50], str(e)[:80])
+            stats["failed"] += 1
+            return
+
+        if not extracted_data:
+            logger.warning("No data extracted from %s", file_path.name[:50])
+            stats["failed"] += 1
+            return
+        stats["ok"] += 1
+
+        meta = source_metadata.get(file_path.name, {})
+        items = extracted_data if isinstance(extracted_data, list) else [extracted_data]
+        valid_items = []
+        for item in items:
+            if not item.get("application_link"):
+                stats["no_link"] += 1
+                continue
+            item["_source"] = meta.get("source", "opportunitiescorners")
+            item["_source_url"] = meta.get("source_url", "")
+            item["_source_md"] = markdown_content
+            valid_items.append(item)
+
+        if not valid_items:
+            logger.info("Skipped %s (no application_link)", file_path.name[:50])
+            return
+        stats["valid"] += len(valid_items)
+        logger.info("Extracted %d with application link from %s", len(valid_items), file_path.name[:50])
+
+        for task in asyncio.as_completed([_translate_item(item, translate_sem) for item in valid_items]):
+            try:
+                opp_id, data_en, data_ar, source, source_url, source_md = await task
+                logger.info("Translated: %s", data_en.get("title", "unknown")[:50])
+                pending_rows.append(
+                    build_db_row(opp_id, data_en, data_ar, source=source, source_url=source_url, source_md=source_md)
+                )
+                pending_en.append(data_en)
+            except Exception as e:
+                logger.error("Translation failed: %s", str(e)[:80])
+
+            if len(pending_rows) >= DB_FLUSH_SIZE:
+                await _flush()
+
+        # When streaming, hand this file's items to embed now instead of waiting for a full batch
+        if out_queue is not None:
+            await _flush()
+
+    logger.info(
+        "Extracting up to %d files concurrently, translating to %s (up to %d concurrently)...",
+        LLM_CONCURRENCY, "Arabic" if SOURCE_LANGUAGE == "en" else "English", TRANSLATE_CONCURRENCY,
+    )
+    try:
+        tasks = []
+        async for file_path in file_paths:
+            if source_metadata is None:
+                source_metadata = _load_source_metadata()
+            stats["files"] += 1
+            tasks.append(asyncio.create_task(_process_file(file_path)))
+        await asyncio.gather(*tasks)
+        await _flush()
+    finally:
+        close_db_pool()
+        # Always record what reached the DB, so a failed run can still be embedded with `embed`
+        if stats["valid"]:
+            OPPORTUNITIES_JSON.write_bytes(
+                orjson.dumps(all_en_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            )
+            logger.info("Saved %d opportunities to %s", len(all_en_data), OPPORTUNITIES_JSON)
 
-    logger.info("Extraction done — %d ok, %d failed, %d skipped (no link)", successful, failed, skipped_no_link)
+    logger.info(
+        "Extraction done — %d files, %d ok, %d failed, %d skipped (no link)",
+        stats["files"], stats["ok"], stats["failed"], stats["no_link"],
+    )
 
-    if not all_extracted_data:
+    if not stats["valid"]:
         logger.warning("No valid opportunities extracted")
         return False
 
-    # ── Translate + save to DB ─────────────────────────────────────────
-    all_en_data = []
-    saved = 0
-
-    for idx, item in enumerate(all_extracted_data, 1):
-        opp_id = item["id"]
-        title_short = item.get("title", "unknown")[:50]
-        logger.info("[%d/%d] %s", idx, len(all_extracted_data), title_short)
-
-        source = item.pop("_source", "opportunitiescorners")
-        source_url = item.pop("_source_url", None)
-        source_md = item.pop("_source_md", None)
+    logger.info("Total saved to DB: %d", saved)
+    return saved > 0
 
-        try:
-            if SOURCE_LANGUAGE == "en":
-                data_en = item
-                logger.info("  Translating to Arabic...")
-                data_ar = translate_to_language(item, "ar")
-            else:
-                data_ar = item
-                logger.info("  Translating to English...")
-                data_en = translate_to_language(item, "en")
 
-            for d in (data_en, data_ar):
-                d.pop("_source_file", None)
+def run() -> bool:
+    """
+    Execute the extraction step.
+    Returns True if new opportunities were extracted and saved.
+    """
+    markdown_files = sorted(OUTPUT_DIR.glob("*.md"))
+    logger.info("Found %d markdown files to process", len(markdown_files))
 
-            save_to_db(opp_id, data_en, data_ar, source=source, source_url=source_url, source_md=source_md)
-            logger.info("  Saved to DB")
-            saved += 1
-            all_en_data.append(data_en)
+    if not markdown_files:
+        logger.warning("No markdown files found in %s — run scrape step first", OUTPUT_DIR)
+        return False
 
-            time.sleep(random.uniform(10, 20))
+    return asyncio.run(_extract_stream(iter_items(markdown_files)))
 
-        except Exception as e:
-            logger.error("  Failed: %s", str(e)[:80])
 
-    # Save English JSON for embed step
-    with open(OPPORTUNITIES_JSON, "w", encoding="utf-8") as f:
-        json.dump(all_en_data, f, ensure_ascii=False, indent=2)
-    logger.info("Saved %d opportunities to %s", len(all_en_data), OPPORTUNITIES_JSON)
-    logger.info("Total saved to DB: %d", saved)
-    return saved > 0
+async def stream(in_queue: asyncio.Queue, out_queue: Optional[asyncio.Queue] = None) -> bool:
+    """
+    Pipeline stage: extract markdown paths from in_queue as they arrive and put
+    each saved English item on out_queue, followed by a None sentinel.
+    """
+    try:
+        return await _extract_stream(iter_queue(in_queue), out_queue)
+    finally:
+        if out_queue is not None:
+            await out_queue.put(None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,17 @@
+"""
+Retry policy shared by the HTTP clients in scrape.py and embed.py.
+"""
+
+from typing import Optional
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Upper bound on any single retry wait, so one huge Retry-After can't stall the run
+MAX_RETRY_DELAY = 60.0
+
+
+def retry_after_seconds(value: Optional[str], attempt: int) -> float:
+    """Seconds to wait before retrying: honour Retry-After, else back off exponentially."""
+    try:
+        return min(max(float(value), 0.0), MAX_RETRY_DELAY)
+    except (TypeError, ValueError):
+        return min(float(2 ** attempt), MAX_RETRY_DELAY)
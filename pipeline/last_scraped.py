@@ -0,0 +1,66 @@
+"""
+Local marker for the latest created_at in the opportunities table.
+
+Lets the scrape step skip a PostgreSQL round trip. The marker is keyed on the
+database it was read from and expires after LAST_SCRAPED_MAX_AGE_HOURS, so a
+switched or cleared DB, or rows ingested from another machine, are picked up
+from the DB instead of trusting a stale value.
+"""
+
+import hashlib
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import orjson
+
+from config import DB_CONFIG, LAST_SCRAPED_PATH, LAST_SCRAPED_MAX_AGE_HOURS
+
+logger = logging.getLogger(__name__)
+
+
+def db_key() -> str:
+    """Identify the target database (no credentials) so a marker never leaks across DBs."""
+    target = f"{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['dbname']}"
+    return hashlib.sha256(target.encode("utf-8")).hexdigest()
+
+
+def _read() -> Optional[dict]:
+    try:
+        marker = orjson.loads(LAST_SCRAPED_PATH.read_bytes())
+        marker["last_scraped"] = datetime.fromisoformat(marker["last_scraped"])
+        marker["checked_at"] = datetime.fromisoformat(marker["checked_at"])
+        return marker
+    except (OSError, orjson.JSONDecodeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def load_marker() -> Optional[datetime]:
+    """Return the cached last scraped date, or None if missing, for another DB, or expired."""
+    if LAST_SCRAPED_MAX_AGE_HOURS <= 0:
+        return None
+    marker = _read()
+    if not marker or marker.get("db") != db_key():
+        return None
+    if datetime.now(timezone.utc) - marker["checked_at"] > timedelta(hours=LAST_SCRAPED_MAX_AGE_HOURS):
+        logger.info("%s is older than %sh — re-reading from DB", LAST_SCRAPED_PATH.name, LAST_SCRAPED_MAX_AGE_HOURS)
+        return None
+    return marker["last_scraped"]
+
+
+def save_marker(last_scraped: datetime, advance_only: bool = False):
+    """
+    Store a created_at value just read from or committed to the DB.
+    With advance_only, never move an existing marker for the same DB backwards.
+    """
+    if last_scraped.tzinfo is None:
+        last_scraped = last_scraped.replace(tzinfo=timezone.utc)
+    if advance_only:
+        marker = _read()
+        if marker and marker.get("db") == db_key() and marker["last_scraped"] >= last_scraped:
+            return
+    LAST_SCRAPED_PATH.write_bytes(orjson.dumps({
+        "db": db_key(),
+        "last_scraped": last_scraped.isoformat(),
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+    }))
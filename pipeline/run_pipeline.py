@@ -1,5 +1,10 @@
 """
-Pipeline orchestrator — runs scrape → extract → embed in sequence.
+Pipeline orchestrator — runs scrape → extract → embed.
+
+When several consecutive steps are requested they run concurrently, connected
+by bounded asyncio queues: each markdown file is extracted as soon as it is
+scraped, and each saved opportunity is embedded as soon as it reaches the DB.
+A single step (or a non-contiguous selection) runs standalone from files.
 
 Usage:
     python run_pipeline.py          # run all 3 steps
@@ -8,6 +13,7 @@ Usage:
     python run_pipeline.py embed    # run only embed
 """
 
+import asyncio
 import logging
 import sys
 import time
@@ -15,6 +21,7 @@ import time
 import scrape
 import extract
 import embed
+from config import PIPELINE_QUEUE_SIZE
 
 logging.basicConfig(
     level=logging.INFO,
@@ -28,6 +35,64 @@ STEPS = {
     "embed": embed.run,
 }
 
+STREAMS = {
+    "scrape": scrape.stream,
+    "extract": extract.stream,
+    "embed": embed.stream,
+}
+
+
+async def _drain(queue: asyncio.Queue, upstream_done: asyncio.Event):
+    """Discard queued items until the upstream step finishes, so it never blocks on a full queue."""
+    while not upstream_done.is_set():
+        try:
+            await asyncio.wait_for(queue.get(), timeout=1)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _run_stream_step(step_name: str, in_queue, out_queue, upstream_done, done) -> bool:
+    """
+    Run one streaming step. Returns False if it raised; the exception is logged
+    here so a failing step never cancels the others.
+    """
+    step_start = time.time()
+    try:
+        has_work = await STREAMS[step_name](in_queue, out_queue)
+    except Exception:
+        logger.exception("Step '%s' failed with an unhandled exception", step_name)
+        # Keep consuming so the upstream step can finish saving what it has
+        if in_queue is not None:
+            await _drain(in_queue, upstream_done)
+        return False
+    finally:
+        done.set()
+    elapsed = time.time() - step_start
+    logger.info("── %s finished in %.1fs (has_work=%s) ──", step_name, elapsed, has_work)
+    return True
+
+
+async def _run_streaming(steps) -> bool:
+    """
+    Run consecutive steps concurrently, each feeding the next through a bounded queue.
+    Returns True if every step completed without raising.
+    """
+    queues = [asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in steps[1:]]
+    done = [asyncio.Event() for _ in steps]
+    ins = [None] + queues
+    outs = queues + [None]
+    upstream = [None] + done[:-1]
+    results = await asyncio.gather(
+        *(_run_stream_step(*args) for args in zip(steps, ins, outs, upstream, done))
+    )
+    return all(results)
+
+
+def _is_contiguous(steps) -> bool:
+    names = list(STEPS)
+    first = names.index(steps[0])
+    return steps == names[first:first + len(steps)]
+
 
 def main():
     requested = sys.argv[1:] if len(sys.argv) > 1 else list(STEPS.keys())
@@ -40,6 +105,13 @@ def main():
     logger.info("=== Starting pipeline: %s ===", " → ".join(requested))
     start = time.time()
 
+    if len(requested) > 1 and _is_contiguous(requested):
+        logger.info("── Streaming steps: %s ──", ", ".join(requested))
+        if not asyncio.run(_run_streaming(requested)):
+            sys.exit(1)
+        logger.info("=== Pipeline completed in %.1fs ===", time.time() - start)
+        return
+
     for step_name in requested:
         logger.info("── Step: %s ──", step_name)
         step_start = time.time()
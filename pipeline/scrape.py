@@ -2,21 +2,32 @@
 Step 1: Scrape latest opportunities from opportunitiescorners.com.
 
 Fetches the homepage, finds new opportunities published after the last
-scraped date in PostgreSQL, downloads each page, and converts to Markdown.
+scraped date in PostgreSQL, downloads the pages concurrently, and converts
+each to Markdown.
 """
 
-import json
+import asyncio
+import csv
 import re
-import time
 import logging
+from dataclasses import asdict, dataclass
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import List, Optional
+from typing import Awaitable, Callable, List, Optional
 
+import httpx
+import orjson
 import psycopg2
 import requests
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
+from requests.adapters import HTTPAdapter
+from markdownify import MarkdownConverter
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser, LexborNode as Node
+
+from http_retry import RETRY_STATUSES, retry_after_seconds
+from last_scraped import db_key, load_marker, save_marker
 
 from config import (
     BASE_URL,
@@ -25,18 +36,74 @@ from config import (
     OUTPUT_DIR,
     CSV_OUTPUT,
     SOURCE_META_PATH,
+    LAST_SCRAPED_PATH,
+    HOMEPAGE_VALIDATORS_PATH,
+    SCRAPE_CONCURRENCY,
+    SCRAPE_MAX_RETRIES,
+    SCRAPE_WORKERS,
+    SCRAPE_USER_AGENT,
 )
 
 logger = logging.getLogger(__name__)
 
+_FN_RE = re.compile(r'[<>:"/\\|?*]')
+_DECOMPOSE_TAGS = ("script", "style", "noscript", "header", "footer", "nav")
+_CLEAN_SEL = ", ".join((*_DECOMPOSE_TAGS, "button"))
+
+# Reused across calls for keep-alive; retries transient homepage failures
+_SESSION = requests.Session()
+_SESSION.headers["User-Agent"] = SCRAPE_USER_AGENT
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=RETRY_STATUSES),
+    ),
+)
+
+# CSS selectors for the opportunitiescorners.com theme
+_SEL_LATEST = "div#tdi_13"
+_SEL_ITEM = "div.td_module_6"
+_SEL_ITEM_LINK = "h3.entry-title a"
+_SEL_ITEM_DATE = "time.td-module-date"
+_SEL_MAIN = "div.td-main-content"
+_SEL_POST = "div.td-post-content"
+
+_MD = MarkdownConverter(heading_style="ATX", strip=["img"], bs4_options="lxml")
+
+
+@dataclass(slots=True)
+class Opp:
+    """One opportunity listed on the homepage; source fields are filled in once its page is scraped."""
+
+    title: Optional[str]
+    link: Optional[str]
+    date_text: Optional[str]
+    datetime: Optional[str]
+    source_url: str = ""
+    source: str = "opportunitiescorners"
+    source_md: str = ""
+
+
+_CSV_FIELDS = ["title", "link", "date_text", "datetime"]
+
 
 # ── Helpers ────────────────────────────────────────────────────────────
 
 
 def get_last_scraped_date() -> Optional[datetime]:
-    """Query PostgreSQL for the max created_at date from the opportunities table."""
+    """
+    Return the max created_at from the opportunities table, read from the local
+    marker while it is fresh and for the same DB, otherwise queried from PostgreSQL.
+    """
+    result = load_marker()
+    if result:
+        logger.info("Last scraped date from %s: %s", LAST_SCRAPED_PATH.name, result.isoformat())
+        return result
+
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
+        conn = psycopg2.connect(**DB_CONFIG, connect_timeout=3, options="-c statement_timeout=5000")
         cur = conn.cursor()
         cur.execute("SELECT MAX(created_at) FROM opportunities;")
         result = cur.fetchone()[0]
@@ -46,6 +113,7 @@ def get_last_scraped_date() -> Optional[datetime]:
             if result.tzinfo is None:
                 result = result.replace(tzinfo=timezone.utc)
             logger.info("Last scraped date from DB: %s", result.isoformat())
+            save_marker(result)
             return result
         logger.info("No existing opportunities in DB — will scrape all")
         return None
@@ -54,202 +122,348 @@ def get_last_scraped_date() -> Optional[datetime]:
         return None
 
 
-def html_to_clean_md(html: str, exclude_domains: Optional[List[str]] = None) -> str:
-    """Parse HTML, remove unwanted elements, convert to clean Markdown."""
-    try:
-        soup = BeautifulSoup(html, "html.parser")
+def _find_parent(node: Node, tag: str) -> Optional[Node]:
+    node = node.parent
+    while node is not None and node.tag != tag:
+        node = node.parent
+    return node
+
 
-        for tag in soup(["script", "style", "noscript", "header", "footer", "nav"]):
-            try:
-                tag.decompose()
-            except Exception:
-                pass
+def _is_inside(node: Node, ancestor_ids: set) -> bool:
+    node = node.parent
+    while node is not None:
+        if node.mem_id in ancestor_ids:
+            return True
+        node = node.parent
+    return False
 
-        for button in soup.find_all("button"):
-            try:
-                a = button.find("a", href=True)
+
+def node_to_clean_md(root: Node, exclude_domains: Optional[List[str]] = None) -> str:
+    """Remove unwanted elements from root's subtree in place and convert its contents to clean Markdown."""
+    try:
+        # One sweep drops unwanted tags and unwraps link buttons; matches come in document
+        # order, so skip anything inside a node already removed or replaced
+        removed = set()
+        for node in root.css(_CLEAN_SEL):
+            if _is_inside(node, removed):
+                continue
+            if node.tag == "button":
+                a = node.css_first("a[href]")
                 if a:
-                    button.replace_with(a)
-            except Exception:
-                pass
+                    removed.add(node.mem_id)
+                    node.replace_with(a)
+            else:
+                removed.add(node.mem_id)
+                node.decompose()
 
         if exclude_domains:
-            a_tags = list(soup.find_all("a", href=True))
-            for a_tag in a_tags:
-                try:
-                    href = a_tag.get("href", "") if a_tag else None
-                    if href and any(domain in href for domain in exclude_domains):
-                        p_tag = a_tag.find_parent("p")
-                        if p_tag and "Also Check" in p_tag.get_text():
-                            p_tag.decompose()
-                        else:
-                            parent_tag = a_tag.find_parent()
-                            if parent_tag and parent_tag.name != "body":
-                                try:
-                                    parent_tag.decompose()
-                                except Exception:
-                                    pass
-                except Exception:
-                    pass
-
-        clean_html = soup.decode_contents()
-        return md(clean_html, heading_style="ATX", strip=["img"])
+            # Collect first, then drop only the outermost targets: decomposing a node
+            # frees its subtree, so nested targets must not be touched afterwards
+            targets = {}
+            for a_tag in root.css("a[href]"):
+                href = a_tag.attributes.get("href")
+                if href and any(domain in href for domain in exclude_domains):
+                    p_tag = _find_parent(a_tag, "p")
+                    if p_tag and "Also Check" in p_tag.text():
+                        targets[p_tag.mem_id] = p_tag
+                    else:
+                        parent_tag = a_tag.parent
+                        if parent_tag and parent_tag.mem_id != root.mem_id and parent_tag.tag != "body":
+                            targets[parent_tag.mem_id] = parent_tag
+            for node in targets.values():
+                if not _is_inside(node, targets.keys()):
+                    node.decompose()
+
+        return _MD.convert(root.inner_html)
     except Exception as e:
-        logger.error("html_to_clean_md error: %s", e)
+        logger.error("Markdown conversion error: %s", e)
         return ""
 
 
+def _write_file(path: Path, data: bytes):
+    """Write bytes straight to the file descriptor, bypassing Python's buffered io layer."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
 def sanitize_filename(filename: str) -> str:
     """Convert a title to a safe filename."""
-    sanitized = re.sub(r'[<>:"/\\|?*]', "", filename).strip()[:100]
-    return sanitized if sanitized else "opportunity"
+    return _FN_RE.sub("", filename).strip()[:100] or "opportunity"
 
 
 # ── Main ───────────────────────────────────────────────────────────────
 
 
-def run() -> bool:
-    """
-    Execute the scraping step.
-    Returns True if there are new opportunities to process, False otherwise.
-    """
-    import pandas as pd
+def _find_content(tree: LexborHTMLParser) -> Optional[Node]:
+    """Return the article body node on an opportunity page, or None."""
+    # Search for the article only inside the first main-content container
+    main_div = tree.css_first(_SEL_MAIN)
+    return (main_div.css_first("article") if main_div else None) or tree.css_first(_SEL_POST)
 
-    last_scraped_date = get_last_scraped_date()
 
-    logger.info("Fetching homepage from %s ...", BASE_URL)
-    response = requests.get(BASE_URL, timeout=30)
-    response.raise_for_status()
-    soup = BeautifulSoup(response.content, "html.parser")
+def _page_to_markdown(html: bytes) -> Optional[str]:
+    # Clean the content node in the page tree directly instead of re-parsing its HTML
+    content = _find_content(LexborHTMLParser(html))
+    if content is None:
+        return None
+    return node_to_clean_md(content, exclude_domains=EXCLUDE_DOMAINS)
 
-    latest_section = soup.find("div", {"id": "tdi_13"})
-    if not latest_section:
-        logger.error("Could not find Latest Opportunities section on homepage")
+
+async def _fetch_page(client: httpx.AsyncClient, url: str) -> bytes:
+    """GET a page body, retrying rate limits, 5xx responses and connection errors with backoff."""
+    for attempt in range(1, SCRAPE_MAX_RETRIES + 1):
+        try:
+            r = await client.get(url)
+            if r.status_code not in RETRY_STATUSES or attempt == SCRAPE_MAX_RETRIES:
+                r.raise_for_status()
+                return r.content
+            reason = f"HTTP {r.status_code}"
+            delay = retry_after_seconds(r.headers.get("Retry-After"), attempt)
+        except httpx.TransportError as e:
+            if attempt == SCRAPE_MAX_RETRIES:
+                raise
+            reason = type(e).__name__
+            delay = retry_after_seconds(None, attempt)
+        logger.warning("Fetch of %s failed (%s) — retrying in %.1fs (attempt %d/%d)", url, reason, delay, attempt, SCRAPE_MAX_RETRIES)
+        await asyncio.sleep(delay)
+
+
+async def fetch_and_write(
+    idx: int,
+    total: int,
+    opp: Opp,
+    client: httpx.AsyncClient,
+    sem: asyncio.BoundedSemaphore,
+    pool: Executor,
+    on_saved: Optional[Callable[[Path], Awaitable[None]]] = None,
+) -> bool:
+    """Fetch one opportunity page, convert it to Markdown and write it to OUTPUT_DIR."""
+    if not opp.link:
+        logger.warning("[%d] %s — no link found", idx, opp.title)
         return False
 
-    opportunity_items = latest_section.find_all("div", class_="td_module_6")
-    all_opportunities = []
+    try:
+        async with sem:
+            logger.info("[%d/%d] Fetching: %s", idx, total, (opp.title or "")[:60])
+            html = await _fetch_page(client, opp.link)
+
+        # Parsing and disk writes run in the pool so other fetches keep flowing
+        loop = asyncio.get_running_loop()
+        markdown_content = await loop.run_in_executor(pool, _page_to_markdown, html)
+        if markdown_content is None:
+            logger.warning("[%d] No content found", idx)
+            return False
+
+        opp.source_url = opp.link
+        opp.source = "opportunitiescorners"
+
+        filename = sanitize_filename(opp.title) + ".md"
+        filepath = OUTPUT_DIR / filename
+
+        full_md = (
+            f"# {opp.title}\n\n"
+            f"**Date:** {opp.date_text}\n\n"
+            f"**Source:** [{opp.link}]({opp.link})\n\n---\n\n"
+            f"{markdown_content}"
+        )
+        opp.source_md = full_md
 
-    for item in opportunity_items:
-        title_elem = item.find("h3", class_="entry-title")
-        if title_elem:
-            a_tag = title_elem.find("a")
-            title = a_tag.text.strip() if a_tag else None
-            link = a_tag["href"] if a_tag else None
-        else:
-            title, link = None, None
+        await loop.run_in_executor(pool, _write_file, filepath, full_md.encode("utf-8"))
+        logger.info("[%d] Saved %s", idx, filename)
+        if on_saved:
+            await on_saved(filepath)
+        return True
 
-        date_elem = item.find("time", class_="td-module-date")
-        date_text = date_elem.text.strip() if date_elem else None
-        datetime_attr = date_elem.get("datetime") if date_elem else None
+    except Exception as e:
+        logger.error("[%d] Error: %s", idx, str(e)[:80])
+        return False
 
-        all_opportunities.append(
-            {"title": title, "link": link, "date_text": date_text, "datetime": datetime_attr}
-        )
 
-    logger.info("Found %d total opportunities on homepage", len(all_opportunities))
+def _is_newer(value: str, cutoff: str, last_scraped_date: datetime) -> bool:
+    """Compare an ISO timestamp against the cutoff, parsing only when it isn't in the cutoff's UTC format."""
+    if len(value) == len(cutoff) and value.endswith("+00:00"):
+        return value > cutoff
+    return datetime.fromisoformat(value) > last_scraped_date
+
+
+def _conditional_headers(has_cutoff: bool) -> dict:
+    """
+    If-None-Match / If-Modified-Since headers from the last fully ingested homepage fetch.
+    Only sent for the same DB and when a cutoff exists, so an empty or switched DB gets the full page.
+    """
+    if not has_cutoff:
+        return {}
+    try:
+        validators = orjson.loads(HOMEPAGE_VALIDATORS_PATH.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return {}
+    if not isinstance(validators, dict) or validators.get("db") != db_key():
+        return {}
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def _find_new_opportunities() -> List[Opp]:
+    """Fetch the homepage and return the opportunities newer than the last scraped date."""
+    last_scraped_date = get_last_scraped_date()
+
+    logger.info("Fetching homepage from %s ...", BASE_URL)
+    # Read the raw stream once into bytes rather than buffering through .content
+    with _SESSION.get(BASE_URL, timeout=30, stream=True, headers=_conditional_headers(last_scraped_date is not None)) as response:
+        if response.status_code == 304:
+            logger.info("Homepage not modified since last check")
+            return []
+        response.raise_for_status()
+        html = response.raw.read(decode_content=True)
+        validators = {
+            "db": db_key(),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+    tree = LexborHTMLParser(html)
+
+    latest_section = tree.css_first(_SEL_LATEST)
+    if not latest_section:
+        logger.error("Could not find Latest Opportunities section on homepage")
+        return []
+
+    # Homepage timestamps are whole-second UTC ISO strings, which compare correctly as text
+    cutoff = last_scraped_date.astimezone(timezone.utc).isoformat(timespec="seconds") if last_scraped_date else None
+    opportunities_data = []
+    for item in latest_section.css(_SEL_ITEM):
+        date_elem = item.css_first(_SEL_ITEM_DATE)
+        datetime_attr = date_elem.attributes.get("datetime") if date_elem else None
+        # Items are listed newest-first, so everything from here on is already scraped
+        if cutoff and datetime_attr and not _is_newer(datetime_attr, cutoff, last_scraped_date):
+            break
+
+        a_tag = item.css_first(_SEL_ITEM_LINK)
+        title = a_tag.text().strip() if a_tag else None
+        link = a_tag.attributes.get("href") if a_tag else None
+        date_text = date_elem.text().strip() if date_elem else None
+
+        opportunities_data.append(Opp(title, link, date_text, datetime_attr))
+
+    # Only remember this homepage version once everything on it is ingested, so a failed
+    # run is retried on the next fetch instead of being skipped by a 304
+    if not opportunities_data:
+        HOMEPAGE_VALIDATORS_PATH.write_bytes(orjson.dumps(validators))
 
-    # Filter by last scraped date
     if last_scraped_date:
-        opportunities_data = []
-        skipped = 0
-        for opp in all_opportunities:
-            if opp["datetime"]:
-                opp_date = datetime.fromisoformat(opp["datetime"])
-                if opp_date > last_scraped_date:
-                    opportunities_data.append(opp)
-                else:
-                    skipped += 1
-            else:
-                opportunities_data.append(opp)
-        logger.info("%d NEW opportunities (skipped %d already scraped)", len(opportunities_data), skipped)
+        logger.info("%d NEW opportunities on homepage", len(opportunities_data))
     else:
-        opportunities_data = all_opportunities
         logger.info("Processing all %d opportunities (first run)", len(opportunities_data))
 
+    return opportunities_data
+
+
+def _dedupe_filenames(opportunities: List[Opp]) -> List[Opp]:
+    """
+    Drop later items whose title maps to an already-used Markdown filename, so concurrent
+    fetches never write (or queue) the same file twice. The homepage is newest-first.
+    """
+    seen = set()
+    unique = []
+    for opp in opportunities:
+        if opp.title:
+            filename = sanitize_filename(opp.title)
+            if filename in seen:
+                logger.warning("Skipping duplicate title: %s", opp.title[:60])
+                continue
+            seen.add(filename)
+        unique.append(opp)
+    return unique
+
+
+async def _scrape(on_saved: Optional[Callable[[Path], Awaitable[None]]] = None) -> bool:
+    """
+    Scrape new opportunities to Markdown, awaiting on_saved(path) after each file is written.
+    Returns True if there are new opportunities to process, False otherwise.
+    """
+    opportunities_data = _dedupe_filenames(await asyncio.to_thread(_find_new_opportunities))
     if not opportunities_data:
         logger.info("No new opportunities to process. Pipeline done.")
         return False
 
     # ── Save CSV ───────────────────────────────────────────────────────
-    df = pd.DataFrame(opportunities_data)
-    df.to_csv(CSV_OUTPUT, index=False)
+    with open(CSV_OUTPUT, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=_CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(asdict(opp) for opp in opportunities_data)
     logger.info("Saved %d opportunities metadata to %s", len(opportunities_data), CSV_OUTPUT)
 
     # ── Save source_metadata.json ──────────────────────────────────────
     source_meta = {}
     for opp in opportunities_data:
-        if opp.get("title"):
-            fname = sanitize_filename(opp["title"]) + ".md"
+        if opp.title:
+            fname = sanitize_filename(opp.title) + ".md"
             source_meta[fname] = {
-                "source": opp.get("source", "opportunitiescorners"),
-                "source_url": opp.get("source_url") or opp.get("link"),
+                "source": opp.source,
+                "source_url": opp.source_url or opp.link,
             }
-    with open(SOURCE_META_PATH, "w", encoding="utf-8") as f:
-        json.dump(source_meta, f, ensure_ascii=False, indent=2)
+    SOURCE_META_PATH.write_bytes(orjson.dumps(source_meta, option=orjson.OPT_INDENT_2))
     logger.info("Saved source metadata for %d opportunities", len(source_meta))
 
     # ── Scrape each page → Markdown ────────────────────────────────────
-    for old_file in OUTPUT_DIR.glob("*.md"):
-        old_file.unlink()
+    with os.scandir(OUTPUT_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".md"):
+                os.unlink(entry.path)
     logger.info("Cleared %s/ for fresh batch", OUTPUT_DIR)
 
-    successful = 0
-    failed = 0
-
-    for idx, opp in enumerate(opportunities_data, 1):
-        if not opp["link"]:
-            logger.warning("[%d] %s — no link found", idx, opp["title"])
-            failed += 1
-            continue
-
-        try:
-            logger.info("[%d/%d] Fetching: %s", idx, len(opportunities_data), (opp["title"] or "")[:60])
-            opp_response = requests.get(opp["link"], timeout=15)
-            opp_response.raise_for_status()
+    total = len(opportunities_data)
+    logger.info("Fetching %d pages (up to %d concurrently)...", total, SCRAPE_CONCURRENCY)
+    sem = asyncio.BoundedSemaphore(SCRAPE_CONCURRENCY)
+    # HTTP/2 multiplexes the page fetches over one connection; falls back to HTTP/1.1 if not negotiated
+    limits = httpx.Limits(max_connections=SCRAPE_CONCURRENCY, max_keepalive_connections=SCRAPE_CONCURRENCY)
+    with ThreadPoolExecutor(max_workers=SCRAPE_WORKERS) as pool:
+        async with httpx.AsyncClient(
+            http2=True,
+            limits=limits,
+            timeout=15,
+            follow_redirects=True,
+            headers={"User-Agent": SCRAPE_USER_AGENT},
+        ) as client:
+            results = await asyncio.gather(
+                *(
+                    fetch_and_write(idx, total, opp, client, sem, pool, on_saved)
+                    for idx, opp in enumerate(opportunities_data, 1)
+                )
+            )
 
-            opp_soup = BeautifulSoup(opp_response.content, "html.parser")
-            main_div = opp_soup.find("div", class_="td-main-content")
-            article = main_div.find("article") if main_div else None
+    successful = sum(results)
+    failed = total - successful
+    logger.info("Scrape complete — %d succeeded, %d failed", successful, failed)
+    return successful > 0
 
-            if article:
-                content_html = article.decode_contents()
-            else:
-                content_div = opp_soup.find("div", class_="td-post-content")
-                if content_div:
-                    content_html = content_div.decode_contents()
-                else:
-                    logger.warning("[%d] No content found", idx)
-                    failed += 1
-                    continue
-
-            markdown_content = html_to_clean_md(content_html, exclude_domains=EXCLUDE_DOMAINS)
-
-            opp["source_url"] = opp["link"]
-            opp["source"] = "opportunitiescorners"
-
-            filename = sanitize_filename(opp["title"]) + ".md"
-            filepath = OUTPUT_DIR / filename
-
-            full_md = (
-                f"# {opp['title']}\n\n"
-                f"**Date:** {opp['date_text']}\n\n"
-                f"**Source:** [{opp['link']}]({opp['link']})\n\n---\n\n"
-                f"{markdown_content}"
-            )
-            opp["source_md"] = full_md
 
-            filepath.write_text(full_md, encoding="utf-8")
-            logger.info("[%d] Saved %s", idx, filename)
-            successful += 1
-            time.sleep(1)
+def run() -> bool:
+    """
+    Execute the scraping step.
+    Returns True if there are new opportunities to process, False otherwise.
+    """
+    return asyncio.run(_scrape())
 
-        except Exception as e:
-            logger.error("[%d] Error: %s", idx, str(e)[:80])
-            failed += 1
 
-    logger.info("Scrape complete — %d succeeded, %d failed", successful, failed)
-    return successful > 0
+async def stream(in_queue: Optional[asyncio.Queue] = None, out_queue: Optional[asyncio.Queue] = None) -> bool:
+    """
+    Pipeline stage: scrape, putting each saved markdown path on out_queue as soon
+    as it is written, then a None sentinel. in_queue is unused (first step).
+    """
+    try:
+        return await _scrape(out_queue.put if out_queue is not None else None)
+    finally:
+        if out_queue is not None:
+            await out_queue.put(None)
 
 
 if __name__ == "__main__":
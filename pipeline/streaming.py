@@ -0,0 +1,23 @@
+"""
+Helpers for wiring pipeline steps together with asyncio queues.
+
+Each step exposes `stream(in_queue, out_queue)`; `None` on a queue marks the
+end of the stream (see run_pipeline.py).
+"""
+
+import asyncio
+from typing import AsyncIterator, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+async def iter_queue(queue: "asyncio.Queue[T | None]") -> AsyncIterator[T]:
+    """Yield items from queue until the None sentinel arrives."""
+    while (item := await queue.get()) is not None:
+        yield item
+
+
+async def iter_items(items: Iterable[T]) -> AsyncIterator[T]:
+    """Adapt a plain iterable to the async-iterator interface used by the streaming steps."""
+    for item in items:
+        yield item